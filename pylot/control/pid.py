@@ -2,12 +2,47 @@
 
 import math
 import time
-from collections import deque
+
+from numba import njit
 
 import numpy as np
 
 import pylot.utils
 
+# Number of past errors over which the derivative and integral terms are
+# computed.
+_ERROR_BUFFER_SIZE = 10
+
+
+@njit(cache=True)
+def _pid_step(errors, num_errors, error, dt, k_p, k_d, k_i):
+    """Runs one PID step over the rolling error window.
+
+    ``errors`` holds the past errors with the oldest first and is mutated
+    in place. Returns the control value clipped to [-1.0, 1.0] and the new
+    number of buffered errors.
+    """
+    if num_errors == errors.shape[0]:
+        for i in range(errors.shape[0] - 1):
+            errors[i] = errors[i + 1]
+        num_errors -= 1
+    errors[num_errors] = error
+    num_errors += 1
+
+    if num_errors >= 2:
+        _de = (errors[num_errors - 1] - errors[num_errors - 2]) / dt
+        _ie = np.sum(errors[:num_errors]) * dt
+    else:
+        _de = 0.0
+        _ie = 0.0
+
+    control = (k_p * error) + (k_d * _de) + (k_i * _ie)
+    if control < -1.0:
+        control = -1.0
+    elif control > 1.0:
+        control = 1.0
+    return control, num_errors
+
 
 class PIDLongitudinalController(object):
     """Implements longitudinal control using a PID.
@@ -30,7 +65,8 @@ class PIDLongitudinalController(object):
         self._dt = dt
         self._use_real_time = use_real_time
         self._last_time = time.time()
-        self._error_buffer = deque(maxlen=10)
+        self._error_buffer = np.zeros(_ERROR_BUFFER_SIZE)
+        self._num_errors = 0
 
     def run_step(self, target_speed: float, current_speed: float):
         """Computes the throttle/brake based on the PID equations.
@@ -44,7 +80,6 @@ class PIDLongitudinalController(object):
         """
         # Transform to km/h
         error = (target_speed - current_speed) * 3.6
-        self._error_buffer.append(error)
 
         if self._use_real_time:
             time_now = time.time()
@@ -52,16 +87,11 @@ class PIDLongitudinalController(object):
             self._last_time = time_now
         else:
             dt = self._dt
-        if len(self._error_buffer) >= 2:
-            _de = (self._error_buffer[-1] - self._error_buffer[-2]) / dt
-            _ie = sum(self._error_buffer) * dt
-        else:
-            _de = 0.0
-            _ie = 0.0
 
-        return np.clip(
-            (self._k_p * error) + (self._k_d * _de) + (self._k_i * _ie), -1.0,
-            1.0)
+        control, self._num_errors = _pid_step(self._error_buffer,
+                                              self._num_errors, error, dt,
+                                              self._k_p, self._k_d, self._k_i)
+        return control
 
 
 class PIDLateralController(object):
@@ -85,7 +115,8 @@ class PIDLateralController(object):
         self._dt = dt
         self._use_real_time = use_real_time
         self._last_time = time.time()
-        self._e_buffer = deque(maxlen=10)
+        self._error_buffer = np.zeros(_ERROR_BUFFER_SIZE)
+        self._num_errors = 0
 
     def run_step(self, waypoint, vehicle_transform):
         v_begin = vehicle_transform.location
@@ -115,14 +146,7 @@ class PIDLateralController(object):
         else:
             dt = self._dt
 
-        self._e_buffer.append(_dot)
-        if len(self._e_buffer) >= 2:
-            _de = (self._e_buffer[-1] - self._e_buffer[-2]) / dt
-            _ie = sum(self._e_buffer) * dt
-        else:
-            _de = 0.0
-            _ie = 0.0
-
-        return np.clip(
-            (self._k_p * _dot) + (self._k_d * _de) + (self._k_i * _ie), -1.0,
-            1.0)
+        control, self._num_errors = _pid_step(self._error_buffer,
+                                              self._num_errors, _dot, dt,
+                                              self._k_p, self._k_d, self._k_i)
+        return control
@@ -67,12 +67,12 @@ class PIDControlOperator(erdos.Operator):
             timestamp (:py:class:`erdos.timestamp.Timestamp`): The timestamp of
                 the watermark.
         """
-        self._logger.debug('@{}: received watermark'.format(timestamp))
-        pose_msg = self._pose_msgs.popleft()
+        self._logger.debug('@%s: received watermark', timestamp)
+        pose_msg = self._pop_until(self._pose_msgs, timestamp)
         ego_transform = pose_msg.data.transform
         # Vehicle speed in m/s.
         current_speed = pose_msg.data.forward_speed
-        waypoints = self._waypoint_msgs.popleft().waypoints
+        waypoints = self._pop_until(self._waypoint_msgs, timestamp).waypoints
         try:
             angle_steer = waypoints.get_angle(
                 ego_transform, self._flags.min_pid_steer_waypoint_distance)
@@ -88,17 +88,30 @@ class PIDControlOperator(erdos.Operator):
             throttle, brake = 0.0, 0.5
             steer = 0.0
         self._logger.debug(
-            '@{}: speed {}, location {}, steer {}, throttle {}, brake {}'.
-            format(timestamp, current_speed, ego_transform, steer, throttle,
-                   brake))
+            '@%s: speed %s, location %s, steer %s, throttle %s, brake %s',
+            timestamp, current_speed, ego_transform, steer, throttle, brake)
         control_stream.send(
             ControlMessage(steer, throttle, brake, False, False, timestamp))
         control_stream.send(erdos.WatermarkMessage(timestamp))
 
+    @staticmethod
+    def _pop_until(queue, timestamp: Timestamp):
+        """Pops messages up to and including the watermark timestamp.
+
+        Returns the newest message with a timestamp at or before the
+        watermark. Draining the queue instead of popping a single message
+        bounds its size when a stream delivers more than one message per
+        watermark.
+        """
+        msg = None
+        while len(queue) > 0 and queue[0].timestamp <= timestamp:
+            msg = queue.popleft()
+        return msg
+
     def on_waypoints_update(self, msg: Message):
-        self._logger.debug('@{}: waypoints update'.format(msg.timestamp))
+        self._logger.debug('@%s: waypoints update', msg.timestamp)
         self._waypoint_msgs.append(msg)
 
     def on_pose_update(self, msg: Message):
-        self._logger.debug('@{}: pose update'.format(msg.timestamp))
+        self._logger.debug('@%s: pose update', msg.timestamp)
         self._pose_msgs.append(msg)
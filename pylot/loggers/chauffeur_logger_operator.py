@@ -1,8 +1,6 @@
-import json
 import os
 from collections import deque
-
-import PIL.Image as Image
+from concurrent.futures import ThreadPoolExecutor
 
 from carla import BoundingBox, Color, TrafficLightState
 
@@ -10,8 +8,12 @@ import cv2
 
 import erdos
 
+from numba import njit, prange
+
 import numpy as np
 
+from scipy.spatial import cKDTree
+
 import pylot.simulation.utils
 import pylot.utils
 
@@ -26,6 +28,41 @@ TL_LOGGING_RADIUS = 40
 TL_BBOX_LIFETIME_BUFFER = 0.1
 
 
+# Note: no cache=True; the pinned numba cannot cache parallel functions
+# and would fall back to recompiling while emitting a warning.
+@njit(parallel=True)
+def _build_tl_color_masks(img, colors, tol):
+    """Computes a color-tolerance mask for each traffic light bbox color.
+
+    A single pass over the image produces all the masks at once, without
+    materializing any intermediate difference arrays.
+    """
+    num_colors = colors.shape[0]
+    height, width = img.shape[0], img.shape[1]
+    masks = np.zeros((num_colors, height, width), dtype=np.uint8)
+    for i in prange(height):
+        for j in range(width):
+            for c in range(num_colors):
+                if (abs(img[i, j, 0] - colors[c, 0]) < tol
+                        and abs(img[i, j, 1] - colors[c, 1]) < tol
+                        and abs(img[i, j, 2] - colors[c, 2]) < tol):
+                    masks[c, i, j] = 255
+    return masks
+
+
+def _to_camera_view(points, projection_matrix):
+    """Projects an (N, 3) array of world points to camera view.
+
+    Vectorized equivalent of :py:meth:`pylot.utils.Vector3D.to_camera_view`;
+    the projection matrix is intrinsic_matrix . inv(extrinsic_matrix)[:3].
+    Returns an (N, 3) array of (x, y, z) screen coordinates.
+    """
+    points_h = np.concatenate([points, np.ones((len(points), 1))], axis=1)
+    screen_points = np.dot(projection_matrix, points_h.T)
+    screen_points[:2] /= screen_points[2]
+    return screen_points.T
+
+
 class ChauffeurLoggerOperator(erdos.Operator):
     """ Logs data in Chauffeur format. """
     def __init__(self, vehicle_id_stream: erdos.ReadStream,
@@ -56,6 +93,41 @@ class ChauffeurLoggerOperator(erdos.Operator):
         self._current_transform = None
         self._previous_transform = None
         self._top_down_camera_setup = top_down_camera_setup
+        # The top down camera setup is fixed, so its matrices can be
+        # computed once instead of on every tracking update.
+        self._extrinsic_matrix = top_down_camera_setup.get_extrinsic_matrix()
+        self._intrinsic_matrix = top_down_camera_setup.get_intrinsic_matrix()
+        self._projection_matrix = np.dot(
+            self._intrinsic_matrix,
+            np.linalg.inv(self._extrinsic_matrix)[:3])
+        # Static traffic light actors and a KD-tree over their locations;
+        # cached in run().
+        self._tl_actors = []
+        self._tl_tree = None
+        # Pool on which frames are serialized to disk so that the PNG
+        # encoding does not block the operator's callbacks. The encoders
+        # release the GIL while compressing.
+        self._io_pool = ThreadPoolExecutor(max_workers=4)
+        # Reusable drawing buffers, cleared with fill(0) on each tracking
+        # update so that no camera-sized array is reallocated per frame.
+        # The futures of the in-flight writes are kept so a buffer is not
+        # cleared while the pool is still encoding it.
+        self._past_poses_buffer = np.zeros(
+            (top_down_camera_setup.height, top_down_camera_setup.width, 3),
+            dtype=np.uint8)
+        self._future_poses_buffer = np.zeros(
+            (top_down_camera_setup.height, top_down_camera_setup.width, 3),
+            dtype=np.uint8)
+        self._poses_write_futures = []
+        # Heading and speed are single scalars per frame; append them to
+        # two pre-opened, buffered CSV logs instead of opening, JSON
+        # encoding and closing a file per value per frame.
+        self._heading_log = open(os.path.join(flags.data_path, 'heading.csv'),
+                                 'w',
+                                 buffering=1 << 16)
+        self._speed_log = open(os.path.join(flags.data_path, 'speed.csv'),
+                               'w',
+                               buffering=1 << 16)
 
     @staticmethod
     def connect(vehicle_id_stream: erdos.ReadStream,
@@ -65,99 +137,121 @@ class ChauffeurLoggerOperator(erdos.Operator):
                 top_down_segmentation_stream: erdos.ReadStream):
         return []
 
+    def destroy(self):
+        # Persist everything that is still buffered: drain the pool of
+        # in-flight image/array writes and flush the CSV logs. Without
+        # this the tail of every log is lost on operator teardown.
+        self._io_pool.shutdown(wait=True)
+        self._heading_log.close()
+        self._speed_log.close()
+
     def run(self):
         # Run method is invoked after all operators finished initializing.
         # Thus, we're sure the world is up-to-date here.
         _, self._world = pylot.simulation.utils.get_world(
             self._flags.simulator_host, self._flags.simulator_port,
             self._flags.simulator_timeout)
+        # Traffic lights are static; fetch them once instead of issuing a
+        # get_actors RPC on every frame.
+        self._tl_actors = list(
+            self._world.get_actors().filter('traffic.traffic_light*'))
+        tl_locations = np.array([[
+            actor.get_transform().location.x,
+            actor.get_transform().location.y,
+            actor.get_transform().location.z
+        ] for actor in self._tl_actors],
+                                dtype=np.float32).reshape(-1, 3)
+        if len(self._tl_actors) > 0:
+            self._tl_tree = cKDTree(tl_locations)
 
     def on_tracking_update(self, msg: erdos.Message):
         assert len(msg.timestamp.coordinates) == 1
-        past_poses = np.zeros((self._top_down_camera_setup.height,
-                               self._top_down_camera_setup.width, 3),
-                              dtype=np.uint8)
-        future_poses = np.zeros((self._top_down_camera_setup.height,
-                                 self._top_down_camera_setup.width, 3),
-                                dtype=np.uint8)
-
-        # Intrinsic and extrinsic matrix of the top down segmentation camera.
-        extrinsic_matrix = self._top_down_camera_setup.get_extrinsic_matrix()
-        intrinsic_matrix = self._top_down_camera_setup.get_intrinsic_matrix()
-
-        rotation = pylot.utils.Rotation()
+        # Wait for the writes of the previous frame (usually already done)
+        # before clearing the reused buffers.
+        for write_future in self._poses_write_futures:
+            write_future.result()
+        past_poses = self._past_poses_buffer
+        past_poses.fill(0)
+        future_poses = self._future_poses_buffer
+        future_poses.fill(0)
+
         for obstacle_trajectory in msg.obstacle_trajectories:
-            # Convert to screen points.
-            screen_points = [
-                transform.location.to_camera_view(extrinsic_matrix,
-                                                  intrinsic_matrix)
-                for transform in obstacle_trajectory.trajectory
-            ]
+            # Convert the trajectory to an (N, 3) array once; every later
+            # step works on the array instead of per-point objects.
+            trajectory = np.array([[
+                transform.location.x, transform.location.y,
+                transform.location.z
+            ] for transform in obstacle_trajectory.trajectory]).reshape(-1, 3)
 
             # Keep track of ground vehicle waypoints
             if obstacle_trajectory.id == self._ground_vehicle_id:
-                self._waypoints = obstacle_trajectory.trajectory
-
-            # Draw trajectory points on segmented image.
-            for point in screen_points:
-                if (0 <= point.x <= self._flags.camera_image_width) and \
-                   (0 <= point.y <= self._flags.camera_image_height):
-                    r = 3
-                    if obstacle_trajectory.id == self._ground_vehicle_id:
-                        r = 10
-                    cv2.circle(past_poses, (int(point.x), int(point.y)), r,
-                               (100, 100, 100), -1)
-
-        # Transform to previous and back to current frame
-        self._waypoints = [
-            self._current_transform.transform_locations(
-                self._previous_transform.inverse_transform_locations(
-                    [wp.location]))[0] for wp in self._waypoints
-        ]
+                self._waypoints = trajectory
+
+            # Convert to screen points.
+            screen_points = _to_camera_view(trajectory,
+                                            self._projection_matrix)
+
+            # Draw trajectory points on segmented image with a single
+            # polylines call per obstacle instead of a circle per point.
+            r = 3
+            if obstacle_trajectory.id == self._ground_vehicle_id:
+                r = 10
+            valid = ((screen_points[:, 0] >= 0) &
+                     (screen_points[:, 0] <= self._flags.camera_image_width) &
+                     (screen_points[:, 1] >= 0) &
+                     (screen_points[:, 1] <= self._flags.camera_image_height))
+            points = screen_points[valid, :2].astype(np.int32)
+            if len(points) > 0:
+                cv2.polylines(past_poses, [points.reshape(-1, 1, 2)],
+                              False, (100, 100, 100),
+                              thickness=2 * r)
+
+        # Transform to previous and back to current frame with a single
+        # composed matrix, rather than applying (and inverting) the two
+        # transforms in separate passes over the waypoints.
+        frame_change = (self._current_transform *
+                        self._previous_transform.inverse_transform())
+        waypoint_array = frame_change.transform_points(self._waypoints)
 
         # Center first point at 0, 0
-        center_transform = pylot.utils.Transform(self._waypoints[0], rotation)
-        self._waypoints = [
-            center_transform.inverse_transform_locations([wp])[0]
-            for wp in self._waypoints
-        ]
+        waypoint_array = waypoint_array - waypoint_array[0]
+        self._waypoints = waypoint_array
 
-        # Convert to screen points
-        screen_waypoints = [
-            wp.to_camera_view(extrinsic_matrix, intrinsic_matrix)
-            for wp in self._waypoints
-        ]
+        # Convert to screen points in a single projection.
+        screen_waypoints = _to_camera_view(waypoint_array,
+                                           self._projection_matrix)
 
         # Draw screen points
-        for point in screen_waypoints:
-            cv2.circle(future_poses, (int(point.x), int(point.y)), 10,
-                       (100, 100, 100), -1)
+        points = np.round(screen_waypoints[:, :2]).astype(np.int32)
+        if len(points) > 0:
+            cv2.polylines(future_poses, [points.reshape(-1, 1, 2)],
+                          False, (100, 100, 100),
+                          thickness=20)
 
         # Log future screen points
-        future_poses_img = Image.fromarray(future_poses)
-        future_poses_img = future_poses_img.convert('RGB')
         file_name = os.path.join(
             self._flags.data_path,
             'future_poses-{}.png'.format(msg.timestamp.coordinates[0] -
                                          len(self._waypoints) * 100))
-        future_poses_img.save(file_name)
+        self._poses_write_futures = [
+            self._io_pool.submit(cv2.imwrite, file_name, future_poses)
+        ]
 
-        # Log future poses
-        waypoints = [str(wp) for wp in self._waypoints]
+        # Log future poses as a raw (N, 3) float32 array; much cheaper
+        # to write and to reload than per-waypoint strings in JSON.
         file_name = os.path.join(
             self._flags.data_path,
-            'waypoints-{}.json'.format(msg.timestamp.coordinates[0] -
-                                       len(self._waypoints) * 100))
-        with open(file_name, 'w') as outfile:
-            json.dump(waypoints, outfile)
+            'waypoints-{}.npy'.format(msg.timestamp.coordinates[0] -
+                                      len(self._waypoints) * 100))
+        self._io_pool.submit(np.save, file_name,
+                             self._waypoints.astype(np.float32))
 
         # Log past screen points
-        past_poses_img = Image.fromarray(past_poses)
-        past_poses_img = past_poses_img.convert('RGB')
         file_name = os.path.join(
             self._flags.data_path,
             'past_poses-{}.png'.format(msg.timestamp.coordinates[0]))
-        past_poses_img.save(file_name)
+        self._poses_write_futures.append(
+            self._io_pool.submit(cv2.imwrite, file_name, past_poses))
 
     def on_top_down_segmentation_update(self, msg: erdos.Message):
         assert len(msg.timestamp.coordinates) == 1
@@ -173,44 +267,40 @@ class ChauffeurLoggerOperator(erdos.Operator):
         assert len(msg.timestamp.coordinates) == 1
         # Make sure transforms deque is full
         self._current_transform = msg.data.transform
-        while len(self._global_transforms) != self._buffer_length:
-            self._global_transforms.append(msg.data.transform)
+        if len(self._global_transforms) < self._buffer_length:
+            self._global_transforms.extend(
+                [msg.data.transform] *
+                (self._buffer_length - len(self._global_transforms)))
         self._previous_transform = self._global_transforms.popleft()
         self._global_transforms.append(msg.data.transform)
 
-        # Log heading
-        file_name = os.path.join(
-            self._flags.data_path,
-            'heading-{}.json'.format(msg.timestamp.coordinates[0]))
-        with open(file_name, 'w') as outfile:
-            json.dump(str(self._current_transform.rotation.yaw), outfile)
-
-        # Log speed
-        file_name = os.path.join(
-            self._flags.data_path,
-            'speed-{}.json'.format(msg.timestamp.coordinates[0]))
-        with open(file_name, 'w') as outfile:
-            json.dump(str(msg.data.forward_speed), outfile)
+        # Log heading and speed.
+        timestamp = msg.timestamp.coordinates[0]
+        self._heading_log.write('{},{}\n'.format(
+            timestamp, self._current_transform.rotation.yaw))
+        self._speed_log.write('{},{}\n'.format(timestamp,
+                                               msg.data.forward_speed))
 
     def on_top_down_camera_update(self, msg: erdos.Message):
         assert len(msg.timestamp.coordinates) == 1
         # Draw traffic light bboxes within TL_LOGGING_RADIUS meters from car
-        tl_actors = self._world.get_actors().filter('traffic.traffic_light*')
-        for tl_actor in tl_actors:
-            dist = self._current_transform.location.distance(
-                tl_actor.get_transform().location)
-            if dist <= TL_LOGGING_RADIUS:
-                self._draw_trigger_volume(self._world, tl_actor)
-
-        # Record traffic light masks
-        img = np.uint8(msg.frame.as_rgb_numpy_array())
+        if self._tl_tree is not None:
+            ego_location = self._current_transform.location
+            indices = self._tl_tree.query_ball_point(
+                [ego_location.x, ego_location.y, ego_location.z],
+                TL_LOGGING_RADIUS)
+            for index in indices:
+                self._draw_trigger_volume(self._world, self._tl_actors[index])
+
+        # Record traffic light masks. asarray is a no-op when the frame
+        # already is a uint8 array, whereas np.uint8 always copies.
+        img = np.asarray(msg.frame.as_rgb_numpy_array(), dtype=np.uint8)
         tl_mask = self._get_traffic_light_channel_from_top_down_rgb(img)
-        tl_img = Image.fromarray(tl_mask)
-        tl_img = tl_img.convert('RGB')
         file_name = os.path.join(
             self._flags.data_path,
             'traffic_lights-{}.png'.format(msg.timestamp.coordinates[0]))
-        tl_img.save(file_name)
+        self._io_pool.submit(cv2.imwrite, file_name,
+                             cv2.cvtColor(tl_mask, cv2.COLOR_GRAY2BGR))
 
     def _draw_trigger_volume(self, world, tl_actor):
         transform = tl_actor.get_transform()
@@ -255,14 +345,16 @@ class ChauffeurLoggerOperator(erdos.Operator):
         tl_mask = np.zeros((h + 2, w + 2), np.uint8)
         # Grayscale values for different traffic light states
         vals = [33, 66, 99]
-        for i, bbox_color in enumerate(tl_bbox_colors):
+        # Using a tolerance of 20 to locate correct boxes. The JIT-compiled
+        # kernel produces the masks for all colors in one pass over the
+        # image instead of one cv2.inRange pass per color.
+        colors = np.array(list(tl_bbox_colors), dtype=np.int64)
+        masks = _build_tl_color_masks(img, colors, 20)
+        for i in range(len(colors)):
             tl_mask_for_bbox_color = np.zeros((h + 2, w + 2), np.uint8)
-            # Using a tolerance of 20 to locate correct boxes.
-            mask = np.all(abs(img - bbox_color) < 20, axis=2).astype(np.uint8)
             # Flood fill from (0, 0) corner.
-            cv2.floodFill(mask, tl_mask_for_bbox_color, (0, 0), 1)
+            cv2.floodFill(masks[i], tl_mask_for_bbox_color, (0, 0), 1)
             # Invert image so mask highlights lights.
-            tl_mask_for_bbox_color = 1 - tl_mask_for_bbox_color
-            tl_mask += tl_mask_for_bbox_color * vals[i]
+            tl_mask += (1 - tl_mask_for_bbox_color) * vals[i]
         # Remove extra rows and cols added for floodFill.
         return tl_mask[1:-1, 1:-1]
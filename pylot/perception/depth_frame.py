@@ -101,12 +101,20 @@ class DepthFrame(object):
         """ Gets the 3D world locations from pixel coordinates.
 
         Args:
-            pixels: List of pylot.utils.Vector2D pixel coordinates.
+            pixels: List of pylot.utils.Vector2D pixel coordinates, or a
+                `(M, 2)` numpy array of integer `(x, y)` coordinates.
         Returns:
-            List of pylot.utils.Locations
+            List of pylot.utils.Locations, or a `(M, 3)` numpy array of
+            world coordinates when the pixels were given as an array.
         """
         if self._cached_point_cloud is None:
             self._cached_point_cloud = self.as_point_cloud()
+        if isinstance(pixels, np.ndarray):
+            # Batched fast path: a single gather from the cached point
+            # cloud, without allocating per-pixel objects.
+            return self._cached_point_cloud[pixels[:, 1] *
+                                            self.camera_setup.width +
+                                            pixels[:, 0]]
         pixel_locations = [
             self._cached_point_cloud[pixel.y * self.camera_setup.width +
                                      pixel.x] for pixel in pixels
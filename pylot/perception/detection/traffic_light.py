@@ -121,7 +121,8 @@ class TrafficLight(Obstacle):
     def is_traffic_light_visible(self,
                                  camera_transform,
                                  town_name=None,
-                                 distance_threshold=70):
+                                 distance_threshold=70,
+                                 camera_forward=None):
         """Checks if the traffic light is visible from the camera transform.
 
         Args:
@@ -129,11 +130,20 @@ class TrafficLight(Obstacle):
                 camera in the world frame of reference.
             distance_threshold (:obj:`int`): Maximum distance to the camera
                 (in m).
+            camera_forward (:obj:`list`, optional): Precomputed forward vector
+                of the camera as `[x, y, z]`. Callers that check many lights
+                against the same camera can compute it once and pass it in.
 
         Returns:
             bool: True if the traffic light is visible from the camera
             transform.
         """
+        if camera_forward is None:
+            camera_forward = [
+                camera_transform.forward_vector.x,
+                camera_transform.forward_vector.y,
+                camera_transform.forward_vector.z
+            ]
         # We dot product the forward vectors (i.e., orientation).
         # Note: we have to rotate the traffic light forward vector
         # so that it's pointing out from the traffic light in the
@@ -141,11 +151,7 @@ class TrafficLight(Obstacle):
         prod = np.dot([
             self.transform.forward_vector.y, -self.transform.forward_vector.x,
             self.transform.forward_vector.z
-        ], [
-            camera_transform.forward_vector.x,
-            camera_transform.forward_vector.y,
-            camera_transform.forward_vector.z
-        ])
+        ], camera_forward)
         if self.transform.location.distance(
                 camera_transform.location) > distance_threshold:
             return prod > 0.4
@@ -179,13 +185,15 @@ class TrafficLight(Obstacle):
         """
         traffic_lights = []
         bboxes = self._get_bboxes(town_name)
+        # Fetch the camera matrices once; they are identical for every
+        # corner of every box in this frame.
+        extrinsic_matrix = depth_frame.camera_setup.get_extrinsic_matrix()
+        intrinsic_matrix = depth_frame.camera_setup.get_intrinsic_matrix()
         # Convert the returned bounding boxes to 2D and check if the
         # light is occluded. If not, add it to the traffic lights list.
         for bbox in bboxes:
             bounding_box = [
-                loc.to_camera_view(
-                    depth_frame.camera_setup.get_extrinsic_matrix(),
-                    depth_frame.camera_setup.get_intrinsic_matrix())
+                loc.to_camera_view(extrinsic_matrix, intrinsic_matrix)
                 for loc in bbox
             ]
             bbox_2d = get_bounding_box_in_camera_view(
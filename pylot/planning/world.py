@@ -5,6 +5,8 @@ from collections import deque
 
 import numpy as np
 
+from scipy.spatial import cKDTree
+
 from pylot.perception.detection.traffic_light import TrafficLightColor
 from pylot.planning.utils import compute_person_speed_factor, \
     compute_vehicle_speed_factor
@@ -266,7 +268,21 @@ class World(object):
                 '@{}: no more waypoints to follow, target speed 0')
             return (0, 0, 0, 0, 0)
 
-        for obstacle in self.obstacle_predictions:
+        # Only check obstacles within the interaction radius; a single
+        # KD-tree query replaces the per-obstacle distance computations
+        # that the speed factor helpers would otherwise reject.
+        nearby_obstacles = self.obstacle_predictions
+        if len(nearby_obstacles) > 0:
+            obstacle_xy = np.array(
+                [[ob.transform.location.x, ob.transform.location.y]
+                 for ob in nearby_obstacles])
+            nearby_indices = cKDTree(obstacle_xy).query_ball_point(
+                [self.ego_transform.location.x, self.ego_transform.location.y],
+                self._flags.dynamic_obstacle_distance_threshold)
+            nearby_obstacles = [
+                nearby_obstacles[i] for i in sorted(nearby_indices)
+            ]
+        for obstacle in nearby_obstacles:
             if obstacle.is_person() and self._flags.stop_for_people:
                 new_speed_factor_p = self.stop_person(obstacle, wp_vector)
                 if new_speed_factor_p < speed_factor_p:
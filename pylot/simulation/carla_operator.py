@@ -316,10 +316,13 @@ class CarlaOperator(erdos.Operator):
             # previous runs of the simulation may persist. We need to clean
             # them up right now. In future, move this logic to a seperate
             # destroy function.
-            pylot.simulation.utils.reset_world(self._world)
+            pylot.simulation.utils.reset_world(self._world, self._client)
         else:
             self._world = self._client.load_world('Town{:02d}'.format(
                 self._flags.simulator_town))
+            # The connection cache still hands out the pre-load world
+            # handle; drop it so later get_world calls see the new world.
+            pylot.simulation.utils.clear_world_cache()
         self._logger.info('Setting the weather to {}'.format(
             self._flags.simulator_weather))
         pylot.simulation.utils.set_weather(self._world,
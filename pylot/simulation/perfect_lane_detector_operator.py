@@ -47,12 +47,11 @@ class PerfectLaneDetectionOperator(erdos.Operator):
         # Run method is invoked after all operators finished initializing.
         # Thus, we're sure the world is up-to-date here.
         if self._flags.execution_mode == 'simulation':
-            from pylot.map.hd_map import HDMap
-            from pylot.simulation.utils import get_map
-            self._map = HDMap(
-                get_map(self._flags.simulator_host, self._flags.simulator_port,
-                        self._flags.simulator_timeout),
-                self.config.log_file_name)
+            from pylot.simulation.utils import get_hd_map
+            self._map = get_hd_map(self._flags.simulator_host,
+                                   self._flags.simulator_port,
+                                   self._flags.simulator_timeout,
+                                   self.config.log_file_name)
             from pylot.simulation.utils import get_world
             _, self._world = get_world(self._flags.simulator_host,
                                        self._flags.simulator_port,
@@ -1,9 +1,16 @@
+import functools
+import os
 import random
 import re
+import threading
 import time
-from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+
+from numba import njit
+
+import numpy as np
 
-import pylot.utils
 from pylot.perception.depth_frame import DepthFrame
 from pylot.perception.detection.obstacle import Obstacle
 from pylot.perception.detection.speed_limit_sign import SpeedLimitSign
@@ -15,6 +22,15 @@ from pylot.perception.detection.utils import BoundingBox2D
 def get_world(host: str = "localhost", port: int = 2000, timeout: int = 10):
     """Get a handle to the world running inside the simulation.
 
+    Connections are memoized per `(host, port, timeout)` within a
+    process: establishing a client involves a handshake and version
+    negotiation, so repeat callers share one connection. The cache key
+    includes the process id because operators are forked from a process
+    that may already hold a connection, and an RPC socket must never be
+    shared across processes. Use :py:func:`clear_world_cache` to force a
+    reconnect (e.g., after the simulator is restarted or a new world is
+    loaded).
+
     Args:
         host (:obj:`str`): The host where the simulator is running.
         port (:obj:`int`): The port to connect to at the given host.
@@ -25,6 +41,16 @@ def get_world(host: str = "localhost", port: int = 2000, timeout: int = 10):
         simulator and `world` is a handle to the world running inside the
         simulation at the host:port.
     """
+    return _cached_world(host, port, timeout, os.getpid())
+
+
+def clear_world_cache():
+    """Drops the memoized simulator connections."""
+    _cached_world.cache_clear()
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_world(host: str, port: int, timeout: int, pid: int):
     try:
         from carla import Client
         client = Client(host, port)
@@ -58,6 +84,37 @@ def get_map(host: str = "localhost", port: int = 2000, timeout: int = 10):
     return world.get_map()
 
 
+# HDMaps are expensive to construct (a simulator RPC plus map parsing);
+# cache them per simulator so that operators in the same process share
+# one instance.
+_hd_map_cache = {}
+
+
+def get_hd_map(host: str = "localhost",
+               port: int = 2000,
+               timeout: int = 10,
+               log_file_name: str = None):
+    """Get a handle to the HD map of the simulation town.
+
+    The map is built once per (host, port) pair and shared by all
+    subsequent callers.
+
+    Args:
+        host (:obj:`str`): The host where the simulator is running.
+        port (:obj:`int`): The port to connect to at the given host.
+        timeout (:obj:`int`): The timeout of the connection (in seconds).
+        log_file_name (:obj:`str`): Name of the log file.
+
+    Returns:
+        :py:class:`~pylot.map.hd_map.HDMap`: The map of the town.
+    """
+    from pylot.map.hd_map import HDMap
+    key = (host, port)
+    if key not in _hd_map_cache:
+        _hd_map_cache[key] = HDMap(get_map(host, port, timeout), log_file_name)
+    return _hd_map_cache[key]
+
+
 def map_from_opendrive(opendrive: str, log_file_name: str = None):
     try:
         from carla import Map
@@ -123,20 +180,67 @@ def set_asynchronous_mode(world):
     world.apply_settings(settings)
 
 
-def reset_world(world):
+# A world.get_actors() call is a full RPC round trip; helpers running in
+# the same frame can share one snapshot. The TTL is kept below the
+# duration of a simulation step at the default frame rate.
+_actor_snapshot_cache = {}
+_ACTOR_SNAPSHOT_TTL = 0.016
+
+
+def get_actor_snapshot(world, ttl: float = _ACTOR_SNAPSHOT_TTL):
+    """Gets the list of actors in the world, possibly from a cache.
+
+    Args:
+        world: A handle to the world running inside the simulation.
+        ttl (:obj:`float`): Maximum age (in seconds) at which a cached
+            actor list is still returned instead of re-fetched.
+
+    Returns:
+        carla.ActorList: The actors present in the world.
+    """
+    key = id(world)
+    entry = _actor_snapshot_cache.get(key)
+    now = time.monotonic()
+    if entry is None or now - entry[0] >= ttl:
+        entry = (now, world.get_actors())
+        _actor_snapshot_cache[key] = entry
+    return entry[1]
+
+
+def _invalidate_actor_snapshot(world):
+    """Drops the cached actor list after the world is known to change."""
+    _actor_snapshot_cache.pop(id(world), None)
+
+
+def reset_world(world, client=None):
     """Resets the simulation to the original state.
 
     Removes all the vehicles, sensors and other actors from the environment.
 
     Args:
         world: A handle to the world running inside the simulation.
+        client: A connection to the simulator. When provided, the actors
+            are destroyed with a single batched command instead of one
+            blocking RPC per actor.
     """
-    actors = world.get_actors()
-    for actor in actors:
-        if actor.type_id == 'spectator' or actor.type_id.startswith('traffic'):
-            pass
-        else:
+    # Destroy from a fresh actor list and drop it afterwards; a cached
+    # snapshot would either miss actors or keep handing out the
+    # destroyed ones.
+    _invalidate_actor_snapshot(world)
+    actors = get_actor_snapshot(world)
+    to_destroy = [
+        actor for actor in actors
+        if not (actor.type_id == 'spectator'
+                or actor.type_id.startswith('traffic'))
+    ]
+    if client is not None:
+        from carla import command
+        client.apply_batch(
+            [command.DestroyActor(actor.id) for actor in to_destroy])
+    else:
+        for actor in to_destroy:
             actor.destroy()
+    _invalidate_actor_snapshot(world)
 
 
 def spawn_actors(client, world, simulator_version: str,
@@ -301,19 +405,54 @@ def set_vehicle_physics(vehicle, moi, mass):
         vehicle.apply_physics_control(physics_control)
 
 
+def _register_tick_event(world):
+    """Registers a tick callback that sets an event on every simulator tick.
+
+    Returns a `(tick_event, callback_id)` tuple; `callback_id` is None when
+    the simulator does not support tick callbacks, in which case callers
+    should fall back to sleeping between retries.
+    """
+    tick_event = threading.Event()
+    try:
+        callback_id = world.on_tick(lambda snapshot: tick_event.set())
+    except AttributeError:
+        callback_id = None
+    return tick_event, callback_id
+
+
 def wait_for_ego_vehicle(world):
     """Loops until a hero vehicle is spawned.
 
     Note: The loop ticks the simulation.
     """
-    # Connect to the ego-vehicle spawned by the scenario runner.
-    while True:
-        time.sleep(0.1)
-        possible_actors = world.get_actors().filter('vehicle.*')
-        for actor in possible_actors:
-            if actor.attributes['role_name'] == 'hero':
-                return actor
-        world.tick()
+    # Connect to the ego-vehicle spawned by the scenario runner. Wake up
+    # on simulator ticks instead of sleeping a fixed quantum, so that the
+    # actor query runs as soon as new actors can exist.
+    tick_event, callback_id = _register_tick_event(world)
+    try:
+        while True:
+            possible_actors = get_actor_snapshot(world).filter('vehicle.*')
+            for actor in possible_actors:
+                if actor.attributes['role_name'] == 'hero':
+                    return actor
+            if callback_id is not None:
+                tick_event.clear()
+            else:
+                time.sleep(0.1)
+            world.tick()
+            if callback_id is not None:
+                tick_event.wait(timeout=1.0)
+            # The tick may have spawned actors; do not re-check a
+            # pre-tick snapshot.
+            _invalidate_actor_snapshot(world)
+    finally:
+        if callback_id is not None:
+            world.remove_on_tick(callback_id)
+
+
+# Pool used to overlap the blocking simulator RPCs issued by the per-actor
+# constructors (transform, velocity and bounding-box queries).
+_actor_pool = ThreadPoolExecutor(max_workers=16)
 
 
 def extract_data_in_pylot_format(actor_list):
@@ -327,34 +466,40 @@ def extract_data_in_pylot_format(actor_list):
         A tuple that contains objects for all different types of actors.
     """
     # Note: the output will include the ego vehicle as well.
-    vec_actors = actor_list.filter('vehicle.*')
-    vehicles = [
-        Obstacle.from_simulator_actor(vec_actor) for vec_actor in vec_actors
-    ]
-
-    person_actors = actor_list.filter('walker.pedestrian.*')
-    people = [
-        Obstacle.from_simulator_actor(ped_actor) for ped_actor in person_actors
-    ]
-
-    tl_actors = actor_list.filter('traffic.traffic_light*')
-    traffic_lights = [
-        TrafficLight.from_simulator_actor(tl_actor) for tl_actor in tl_actors
-    ]
-
-    speed_limit_actors = actor_list.filter('traffic.speed_limit*')
-    speed_limits = [
-        SpeedLimitSign.from_simulator_actor(ts_actor)
-        for ts_actor in speed_limit_actors
-    ]
-
-    traffic_stop_actors = actor_list.filter('traffic.stop')
-    traffic_stops = [
-        StopSign.from_simulator_actor(ts_actor)
-        for ts_actor in traffic_stop_actors
-    ]
-
-    return (vehicles, people, traffic_lights, speed_limits, traffic_stops)
+    # Classify the actors in a single pass over the list instead of five
+    # filter() calls that each rescan every actor.
+    vec_actors = []
+    person_actors = []
+    tl_actors = []
+    speed_limit_actors = []
+    traffic_stop_actors = []
+    for actor in actor_list:
+        type_id = actor.type_id
+        if type_id.startswith('vehicle.'):
+            vec_actors.append(actor)
+        elif type_id.startswith('walker.pedestrian.'):
+            person_actors.append(actor)
+        elif type_id.startswith('traffic.traffic_light'):
+            tl_actors.append(actor)
+        elif type_id.startswith('traffic.speed_limit'):
+            speed_limit_actors.append(actor)
+        elif type_id == 'traffic.stop':
+            traffic_stop_actors.append(actor)
+
+    # Launch the conversions for all categories before materializing any
+    # of them, so the blocking simulator RPCs issued by the constructors
+    # overlap across the pool threads.
+    vehicles = _actor_pool.map(Obstacle.from_simulator_actor, vec_actors)
+    people = _actor_pool.map(Obstacle.from_simulator_actor, person_actors)
+    traffic_lights = _actor_pool.map(TrafficLight.from_simulator_actor,
+                                     tl_actors)
+    speed_limits = _actor_pool.map(SpeedLimitSign.from_simulator_actor,
+                                   speed_limit_actors)
+    traffic_stops = _actor_pool.map(StopSign.from_simulator_actor,
+                                    traffic_stop_actors)
+
+    return (list(vehicles), list(people), list(traffic_lights),
+            list(speed_limits), list(traffic_stops))
 
 
 def draw_trigger_volume(world, actor):
@@ -393,18 +538,136 @@ def get_traffic_lights_obstacles(traffic_lights, depth_frame, segmented_frame,
         List of detected traffic light obstacles.
     """
     camera_transform = depth_frame.camera_setup.get_transform()
+    # Compute the camera forward vector once; it is identical for every
+    # visibility check in this frame.
+    camera_forward = [
+        camera_transform.forward_vector.x, camera_transform.forward_vector.y,
+        camera_transform.forward_vector.z
+    ]
+    # Cull lights behind the camera with one batched dot product before
+    # running the per-light visibility test; in a full town more than
+    # half of the lights typically fail it.
+    if len(traffic_lights) > 0:
+        cam_loc = np.array([
+            camera_transform.location.x, camera_transform.location.y,
+            camera_transform.location.z
+        ])
+        light_xyz = np.array([[
+            light.transform.location.x, light.transform.location.y,
+            light.transform.location.z
+        ] for light in traffic_lights])
+        in_front = (light_xyz - cam_loc) @ np.array(camera_forward) > 0
+        traffic_lights = [traffic_lights[i] for i in np.flatnonzero(in_front)]
+    # Materialize the segmented frame once instead of re-extracting the
+    # array for every light.
+    segmented_image = segmented_frame.as_numpy_array()
     # Iterate over all the traffic lights, and figure out which ones are
     # facing us and are visible in the camera view.
     detected = []
     for light in traffic_lights:
-        if not light.is_traffic_light_visible(camera_transform, town_name):
+        if not light.is_traffic_light_visible(
+                camera_transform, town_name, camera_forward=camera_forward):
             continue
         detected.extend(
-            light.get_all_detected_traffic_light_boxes(
-                town_name, depth_frame, segmented_frame.as_numpy_array()))
+            light.get_all_detected_traffic_light_boxes(town_name, depth_frame,
+                                                       segmented_image))
     return detected
 
 
+# Maximum squared distance (in m^2) between a detected bounding box center
+# and a speed sign for the two to be considered a match.
+_SPEED_SIGN_MAX_DIST_SQUARED = 25.0
+
+# Maximum squared distance (in m^2) at which a stop marking can still be
+# resolved by the camera; stops beyond it are culled before projection.
+_STOP_MAX_DIST_SQUARED = 50.0**2
+
+# Minimum number of candidate (bounding box, sign) pairs at which the
+# compiled matching kernel is dispatched; below it the numpy path is
+# faster because it does not pay the JIT warmup.
+_SPEED_SIGN_KERNEL_MIN_PAIRS = 32
+
+
+@njit(cache=True, fastmath=True)
+def _match_speed_signs_kernel(loc_xyz, sign_xyz, cam_yaw, sign_yaws,
+                              dist_squared_threshold):
+    """Finds the nearest speed sign per bounding box.
+
+    Returns the per-box index of the nearest sign, together with a mask
+    that is set when the sign is within range and facing the camera.
+    """
+    num_locs = loc_xyz.shape[0]
+    num_signs = sign_xyz.shape[0]
+    best_indices = np.empty(num_locs, np.int64)
+    matched = np.empty(num_locs, np.bool_)
+    for i in range(num_locs):
+        x = loc_xyz[i, 0]
+        # The signs are sorted by x; expand outward from the insertion
+        # point and stop as soon as the x gap alone exceeds the best
+        # squared distance, since every remaining sign is farther in x.
+        right = np.searchsorted(sign_xyz[:, 0], x)
+        left = right - 1
+        best = 0
+        best_dist_squared = np.inf
+        while left >= 0 or right < num_signs:
+            if left >= 0 and (right >= num_signs or
+                              x - sign_xyz[left, 0] <= sign_xyz[right, 0] - x):
+                j = left
+                from_left = True
+            else:
+                j = right
+                from_left = False
+            dx = x - sign_xyz[j, 0]
+            if dx * dx > best_dist_squared:
+                break
+            dy = loc_xyz[i, 1] - sign_xyz[j, 1]
+            dz = loc_xyz[i, 2] - sign_xyz[j, 2]
+            dist_squared = dx * dx + dy * dy + dz * dz
+            if dist_squared < best_dist_squared:
+                best_dist_squared = dist_squared
+                best = j
+            if from_left:
+                left -= 1
+            else:
+                right += 1
+        yaw_diff = (sign_yaws[best] - cam_yaw) % 360.0
+        best_indices[i] = best
+        matched[i] = (best_dist_squared < dist_squared_threshold
+                      and yaw_diff > 30 and yaw_diff < 150)
+    return best_indices, matched
+
+
+# Single-slot cache with the structure-of-arrays form of the last
+# speed-sign list, so the ts.transform.location / ts.transform.rotation
+# attribute walks happen once per list rather than once per frame when a
+# caller passes the same list object again. The entry keeps a reference
+# to the list and is validated by identity, so a recycled address can
+# never alias a different list.
+_speed_signs_soa_cache = (None, None)
+
+
+def _speed_signs_to_soa(speed_signs):
+    """Returns `(sign_xyz, sign_yaws, sign_order)` arrays for the signs.
+
+    The arrays are sorted by the x coordinate so the matching kernel can
+    prune its scan; `sign_order` maps a sorted index back to the index in
+    `speed_signs`.
+    """
+    global _speed_signs_soa_cache
+    cached_list, cached_soa = _speed_signs_soa_cache
+    if cached_list is speed_signs:
+        return cached_soa
+    sign_xyz = np.array([[
+        ts.transform.location.x, ts.transform.location.y,
+        ts.transform.location.z
+    ] for ts in speed_signs])
+    sign_yaws = np.array([ts.transform.rotation.yaw for ts in speed_signs])
+    sign_order = np.argsort(sign_xyz[:, 0])
+    soa = (sign_xyz[sign_order], sign_yaws[sign_order], sign_order)
+    _speed_signs_soa_cache = (speed_signs, soa)
+    return soa
+
+
 def get_detected_speed_limits(speed_signs, depth_frame, segmented_frame):
     """Get the speed limit signs that are within the camera frame.
 
@@ -425,27 +688,34 @@ def get_detected_speed_limits(speed_signs, depth_frame, segmented_frame):
         list(:py:class:`~pylot.perception.detection.speed_limit_sign.SpeedLimitSign`):
         List of detected speed limits with 2D bounding boxes set.
     """
-    def match_bboxes_with_speed_signs(camera_transform, loc_bboxes,
+    def match_bboxes_with_speed_signs(camera_transform, loc_xyz, bboxes_2d,
                                       speed_signs):
         result = []
-        for location, bbox in loc_bboxes:
-            best_ts = None
-            best_dist = 1000000
-            for ts in speed_signs:
-                dist = location.distance(ts.transform.location)
-                if dist < best_dist:
-                    best_dist = dist
-                    best_ts = ts
-            if not best_ts:
-                continue
-            # Check that the sign is facing the ego vehicle.
-            yaw_diff = (best_ts.transform.rotation.yaw -
-                        camera_transform.rotation.yaw)
-            if yaw_diff < 0:
-                yaw_diff += 360
-            elif yaw_diff >= 360:
-                yaw_diff -= 360
-            if best_dist < 5**2 and yaw_diff > 30 and yaw_diff < 150:
+        if len(bboxes_2d) == 0 or len(speed_signs) == 0:
+            return result
+        sign_xyz, sign_yaws, sign_order = _speed_signs_to_soa(speed_signs)
+        cam_yaw = camera_transform.rotation.yaw
+        if len(bboxes_2d) * len(speed_signs) > _SPEED_SIGN_KERNEL_MIN_PAIRS:
+            best_indices, matched = _match_speed_signs_kernel(
+                np.ascontiguousarray(loc_xyz, dtype=np.float64), sign_xyz,
+                cam_yaw, sign_yaws, _SPEED_SIGN_MAX_DIST_SQUARED)
+        else:
+            # Compute all pairwise squared distances in one broadcasted
+            # pass and pick the nearest sign per bounding box with
+            # argmin.
+            dist_squared = ((loc_xyz[:, np.newaxis, :] -
+                             sign_xyz[np.newaxis, :, :])**2).sum(axis=-1)
+            best_indices = dist_squared.argmin(axis=1)
+            best_dists_squared = dist_squared[np.arange(len(bboxes_2d)),
+                                              best_indices]
+            # Check that the matched signs are facing the ego vehicle.
+            # The modulo normalizes the yaw difference branchlessly.
+            yaw_diffs = (sign_yaws[best_indices] - cam_yaw) % 360.0
+            matched = ((best_dists_squared < _SPEED_SIGN_MAX_DIST_SQUARED)
+                       & (yaw_diffs > 30) & (yaw_diffs < 150))
+        for i, bbox in enumerate(bboxes_2d):
+            if matched[i]:
+                best_ts = speed_signs[sign_order[best_indices[i]]]
                 best_ts.bounding_box = bbox
                 result.append(best_ts)
         return result
@@ -456,15 +726,71 @@ def get_detected_speed_limits(speed_signs, depth_frame, segmented_frame):
     # Compute the 2D bounding boxes.
     bboxes_2d = segmented_frame.get_traffic_sign_bounding_boxes(min_width=8,
                                                                 min_height=9)
-    # Transform the centers of 2D bounding boxes to 3D locations.
-    coordinates = [bbox.get_center_point() for bbox in bboxes_2d]
-    locations = depth_frame.get_pixel_locations(coordinates)
-    loc_and_bboxes = zip(locations, bboxes_2d)
+    if len(bboxes_2d) == 0:
+        return []
+    # Transform the centers of the 2D bounding boxes to 3D locations with
+    # one batched pixel lookup, without materializing Vector2D/Location
+    # objects along the way.
+    centers = np.array([[(bbox.x_min + bbox.x_max) // 2,
+                         (bbox.y_min + bbox.y_max) // 2]
+                        for bbox in bboxes_2d])
+    loc_xyz = depth_frame.get_pixel_locations(centers)
     det_speed_limits = match_bboxes_with_speed_signs(
-        depth_frame.camera_setup.transform, loc_and_bboxes, speed_signs)
+        depth_frame.camera_setup.transform, loc_xyz, bboxes_2d, speed_signs)
     return det_speed_limits
 
 
+@functools.lru_cache(maxsize=8)
+def _stop_projection_constants(camera_setup_id, width, height,
+                               intrinsic_bytes):
+    """Returns the projection constants for a camera setup.
+
+    The intrinsic matrix and the frame dimensions are fixed for the life
+    of a sensor, so the contiguous float64 copy the projection kernel
+    needs is materialized once per camera setup instead of once per
+    frame. The extrinsic matrix changes with the camera pose and must be
+    inverted by the caller every frame.
+    """
+    intrinsic = np.frombuffer(intrinsic_bytes, dtype=np.float64).reshape(
+        (3, 3))
+    return np.ascontiguousarray(intrinsic), float(width), float(height)
+
+
+@njit(cache=True, fastmath=True)
+def _project_stop_corners(transforms, corners, inv_camera, intrinsic, width,
+                          height):
+    """Projects the trigger-volume corners of all stops to image space.
+
+    The workload is a chain of small (4x4) matrix products per stop, too
+    small to amortize numpy dispatch overhead, so the loop is compiled
+    instead. Returns per-corner image coordinates and depths, plus a
+    per-stop flag that is set when all 4 corners land inside the frame
+    with non-negative depth.
+    """
+    num_stops = transforms.shape[0]
+    xs = np.empty((num_stops, 4))
+    ys = np.empty((num_stops, 4))
+    zs = np.empty((num_stops, 4))
+    valid = np.empty(num_stops, np.bool_)
+    for k in range(num_stops):
+        # Project local -> world -> camera -> image.
+        world = corners[k] @ transforms[k].T
+        camera = world @ inv_camera.T
+        image = camera[:, :3] @ intrinsic.T
+        all_in_frame = True
+        for c in range(4):
+            z = image[c, 2]
+            x = image[c, 0] / z
+            y = image[c, 1] / z
+            xs[k, c] = x
+            ys[k, c] = y
+            zs[k, c] = z
+            if not (z >= 0 and x >= 0 and y >= 0 and x < width and y < height):
+                all_in_frame = False
+        valid[k] = all_in_frame
+    return xs, ys, zs, valid
+
+
 def get_detected_traffic_stops(traffic_stops, depth_frame):
     """Gets traffic stop lane markings that are withing the camera frame.
 
@@ -482,72 +808,117 @@ def get_detected_traffic_stops(traffic_stops, depth_frame):
         list(:py:class:`~pylot.perception.detection.stop_sign.StopSign`):
         List of detected traffic stops with 2D bounding boxes set.
     """
-    def get_stop_markings_bbox(bbox3d, depth_frame):
-        """ Gets a 2D stop marking bounding box from a 3D bounding box."""
-        # Move trigger_volume by -0.85 so that the top plane is on the ground.
-        ext_z_value = bbox3d.extent.z - 0.85
-        ext = [
-            pylot.utils.Location(x=+bbox3d.extent.x,
-                                 y=+bbox3d.extent.y,
-                                 z=ext_z_value),
-            pylot.utils.Location(x=+bbox3d.extent.x,
-                                 y=-bbox3d.extent.y,
-                                 z=ext_z_value),
-            pylot.utils.Location(x=-bbox3d.extent.x,
-                                 y=+bbox3d.extent.y,
-                                 z=ext_z_value),
-            pylot.utils.Location(x=-bbox3d.extent.x,
-                                 y=-bbox3d.extent.y,
-                                 z=ext_z_value),
-        ]
-        bbox = bbox3d.transform.transform_locations(ext)
-        camera_transform = depth_frame.camera_setup.get_transform()
-        coords = []
-        for loc in bbox:
-            loc_view = loc.to_camera_view(
-                camera_transform.matrix,
-                depth_frame.camera_setup.get_intrinsic_matrix())
-            if (loc_view.z >= 0 and loc_view.x >= 0 and loc_view.y >= 0
-                    and loc_view.x < depth_frame.camera_setup.width
-                    and loc_view.y < depth_frame.camera_setup.height):
-                coords.append(loc_view)
-        if len(coords) == 4:
-            xmin = min(coords[0].x, coords[1].x, coords[2].x, coords[3].x)
-            xmax = max(coords[0].x, coords[1].x, coords[2].x, coords[3].x)
-            ymin = min(coords[0].y, coords[1].y, coords[2].y, coords[3].y)
-            ymax = max(coords[0].y, coords[1].y, coords[2].y, coords[3].y)
-            # Check if the bbox is not obstructed and if it's sufficiently
-            # big for the text to be readable.
-            if (ymax - ymin > 15 and depth_frame.pixel_has_same_depth(
-                    int(coords[0].x), int(coords[0].y), coords[0].z, 0.4)):
-                return BoundingBox2D(int(xmin), int(xmax), int(ymin),
-                                     int(ymax))
-        return None
-
     if not isinstance(depth_frame, DepthFrame):
         raise ValueError(
             'depth_frame should be of type perception.depth_frame.DepthFrame')
     det_stop_signs = []
-    for stop_sign in traffic_stops:
-        bbox_2d = get_stop_markings_bbox(stop_sign.bounding_box_3d,
-                                         depth_frame)
-        if bbox_2d is not None:
-            stop_sign.bounding_box = bbox_2d
+    if len(traffic_stops) == 0:
+        return det_stop_signs
+    camera_setup = depth_frame.camera_setup
+    camera_transform = camera_setup.get_transform()
+    # Coarsely cull stops that are behind the camera or beyond the range
+    # at which the marking text is readable, before paying for the
+    # 4-corner projection. Most stops in a town fail this test.
+    cam_loc = np.array([
+        camera_transform.location.x, camera_transform.location.y,
+        camera_transform.location.z
+    ])
+    cam_fwd = np.array([
+        camera_transform.forward_vector.x, camera_transform.forward_vector.y,
+        camera_transform.forward_vector.z
+    ])
+    stop_xyz = np.array([[
+        stop_sign.bounding_box_3d.transform.location.x,
+        stop_sign.bounding_box_3d.transform.location.y,
+        stop_sign.bounding_box_3d.transform.location.z
+    ] for stop_sign in traffic_stops])
+    deltas = stop_xyz - cam_loc
+    in_frustum = (
+        (deltas @ cam_fwd > 0)
+        & (np.einsum('ij,ij->i', deltas, deltas) <= _STOP_MAX_DIST_SQUARED))
+    traffic_stops = [traffic_stops[i] for i in np.flatnonzero(in_frustum)]
+    if len(traffic_stops) == 0:
+        return det_stop_signs
+    # Gather the 4 ground-plane corners of every stop's trigger volume in
+    # homogeneous local coordinates, together with the per-stop transform
+    # matrices, so that all stops can be projected in one batched pass.
+    corners = np.empty((len(traffic_stops), 4, 4))
+    transforms = np.empty((len(traffic_stops), 4, 4))
+    for i, stop_sign in enumerate(traffic_stops):
+        bbox3d = stop_sign.bounding_box_3d
+        # Move trigger_volume by -0.85 so that the top plane is on the ground.
+        ext_z_value = bbox3d.extent.z - 0.85
+        corners[i] = [[+bbox3d.extent.x, +bbox3d.extent.y, ext_z_value, 1.0],
+                      [+bbox3d.extent.x, -bbox3d.extent.y, ext_z_value, 1.0],
+                      [-bbox3d.extent.x, +bbox3d.extent.y, ext_z_value, 1.0],
+                      [-bbox3d.extent.x, -bbox3d.extent.y, ext_z_value, 1.0]]
+        transforms[i] = bbox3d.transform.matrix
+    inv_camera = np.linalg.inv(camera_transform.matrix)
+    intrinsic, width, height = _stop_projection_constants(
+        id(camera_setup), camera_setup.width, camera_setup.height,
+        np.asarray(camera_setup.get_intrinsic_matrix(),
+                   dtype=np.float64).tobytes())
+    xs, ys, zs, valid = _project_stop_corners(transforms, corners,
+                                              np.ascontiguousarray(inv_camera),
+                                              intrinsic, width, height)
+    candidates = np.flatnonzero(valid)
+    if len(candidates) == 0:
+        return det_stop_signs
+    # Check that the marking is not obstructed by sampling the depth
+    # buffer for all candidate stops with one gather, rather than a
+    # per-stop pixel_has_same_depth call. The buffer stores normalized
+    # depth; multiplying by 1000 converts to meters.
+    x0 = xs[candidates, 0].astype(np.int32)
+    y0 = ys[candidates, 0].astype(np.int32)
+    sampled_depths = depth_frame.frame[y0, x0] * 1000
+    unobstructed = np.abs(sampled_depths - zs[candidates, 0]) < 0.4
+    # Reduce the corner extents for all stops at once rather than with
+    # four per-stop min/max calls inside the loop.
+    xmins = xs.min(axis=1)
+    xmaxs = xs.max(axis=1)
+    ymins = ys.min(axis=1)
+    ymaxs = ys.max(axis=1)
+    for i, depth_ok in zip(candidates, unobstructed):
+        if not depth_ok:
+            continue
+        # Check if the bbox is sufficiently big for the text to be
+        # readable.
+        if ymaxs[i] - ymins[i] > 15:
+            stop_sign = traffic_stops[i]
+            stop_sign.bounding_box = BoundingBox2D(int(xmins[i]),
+                                                   int(xmaxs[i]),
+                                                   int(ymins[i]),
+                                                   int(ymaxs[i]))
             det_stop_signs.append(stop_sign)
     return det_stop_signs
 
 
 def get_vehicle_handle(world, vehicle_id: int):
-    num_tries = 0
-    while num_tries < 50:
-        vehicle = world.get_actors().find(vehicle_id)
-        if vehicle:
-            return vehicle
-        time.sleep(0.5)
-        num_tries += 1
-    raise ValueError("There was an issue finding the vehicle.")
-
-
-class TrafficInfractionType(Enum):
+    # Wake up on simulator ticks rather than sleeping half a second
+    # between retries; fall back to polling when tick callbacks are
+    # unavailable.
+    tick_event, callback_id = _register_tick_event(world)
+    try:
+        num_tries = 0
+        while num_tries < 50:
+            vehicle = get_actor_snapshot(world).find(vehicle_id)
+            if vehicle:
+                return vehicle
+            if callback_id is not None:
+                tick_event.clear()
+                tick_event.wait(timeout=0.5)
+            else:
+                time.sleep(0.5)
+            # A tick has elapsed; query a fresh actor list on the next
+            # try instead of the pre-tick snapshot.
+            _invalidate_actor_snapshot(world)
+            num_tries += 1
+        raise ValueError("There was an issue finding the vehicle.")
+    finally:
+        if callback_id is not None:
+            world.remove_on_tick(callback_id)
+
+
+class TrafficInfractionType(IntEnum):
     """ An enumeration of the different infractions that Pylot supports. """
     RED_LIGHT_INVASION = 1
@@ -0,0 +1,19 @@
+# This module provides mocked versions of the numba decorators so that
+# the compiled kernels can be exercised as plain Python functions in
+# environments where numba is not installed.
+
+
+def njit(*args, **kwargs):
+    """ A mock of numba.njit that leaves the function uncompiled. """
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+
+    def wrap(func):
+        return func
+
+    return wrap
+
+
+def prange(*args):
+    """ A mock of numba.prange. """
+    return range(*args)
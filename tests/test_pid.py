@@ -0,0 +1,57 @@
+import sys
+from collections import deque
+
+# Mock the import of numba if it is not available, so that the PID
+# kernel runs as a plain Python function.
+try:
+    import numba  # noqa: F401
+except ImportError:
+    sys.modules['numba'] = __import__('mocked_numba')
+
+import numpy as np
+
+from pylot.control.pid import _ERROR_BUFFER_SIZE, _pid_step
+
+
+def _make_reference_pid(k_p, k_d, k_i, dt):
+    """Builds a deque-based reference PID step mirroring the original
+    uncompiled controller implementation."""
+    error_buffer = deque(maxlen=_ERROR_BUFFER_SIZE)
+
+    def step(error):
+        error_buffer.append(error)
+        if len(error_buffer) >= 2:
+            _de = (error_buffer[-1] - error_buffer[-2]) / dt
+            _ie = sum(error_buffer) * dt
+        else:
+            _de = 0.0
+            _ie = 0.0
+        return float(
+            np.clip((k_p * error) + (k_d * _de) + (k_i * _ie), -1.0, 1.0))
+
+    return step
+
+
+def test_pid_step_matches_reference():
+    """Test that the compiled PID step tracks the reference controller
+    across enough steps to roll the error window over several times."""
+    k_p, k_d, k_i, dt = 0.5, 0.1, 0.05, 0.05
+    reference_step = _make_reference_pid(k_p, k_d, k_i, dt)
+    errors = np.zeros(_ERROR_BUFFER_SIZE)
+    num_errors = 0
+    rng = np.random.RandomState(42)
+    for error in rng.uniform(-2.0, 2.0, 50):
+        control, num_errors = _pid_step(errors, num_errors, error, dt, k_p,
+                                        k_d, k_i)
+        assert np.isclose(control, reference_step(error)), \
+            "Control value diverges from the reference controller."
+    assert num_errors == _ERROR_BUFFER_SIZE, "Error window is not full."
+
+
+def test_pid_step_saturates():
+    """Test that the control value is clipped to [-1.0, 1.0]."""
+    errors = np.zeros(_ERROR_BUFFER_SIZE)
+    control, num_errors = _pid_step(errors, 0, 100.0, 0.05, 1.0, 0.0, 0.0)
+    assert np.isclose(control, 1.0), "Control value is not clipped to 1.0."
+    control, _ = _pid_step(errors, num_errors, -100.0, 0.05, 1.0, 0.0, 0.0)
+    assert np.isclose(control, -1.0), "Control value is not clipped to -1.0."
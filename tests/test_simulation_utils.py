@@ -0,0 +1,102 @@
+import sys
+
+# Mock the import of numba if it is not available, so that the compiled
+# kernels run as plain Python functions.
+try:
+    import numba  # noqa: F401
+except ImportError:
+    sys.modules['numba'] = __import__('mocked_numba')
+
+import numpy as np
+
+import pytest
+
+sim_utils = pytest.importorskip('pylot.simulation.utils')
+
+## Speed sign matching tests
+
+
+def test_speed_sign_matching_radius():
+    """Test that the matching threshold is 25 m^2, i.e. a 5 meter radius."""
+    assert np.isclose(sim_utils._SPEED_SIGN_MAX_DIST_SQUARED, 25.0), \
+        "The matching threshold is not 25 square meters."
+    # One bounding box at the origin and one facing sign, just inside and
+    # just outside the matching radius.
+    loc_xyz = np.zeros((1, 3))
+    sign_yaws = np.array([90.0])
+    for distance, expected in [(4.9, True), (5.1, False)]:
+        sign_xyz = np.array([[distance, 0.0, 0.0]])
+        _, matched = sim_utils._match_speed_signs_kernel(
+            loc_xyz, sign_xyz, 0.0, sign_yaws,
+            sim_utils._SPEED_SIGN_MAX_DIST_SQUARED)
+        assert matched[0] == expected, \
+            "A sign {}m away should{} match.".format(
+                distance, '' if expected else ' not')
+
+
+@pytest.mark.parametrize("seed", [7, 8, 9])
+def test_match_speed_signs_kernel(seed):
+    """Test the pruned nearest-sign kernel against a brute-force argmin."""
+    rng = np.random.RandomState(seed)
+    dist_squared_threshold = 625.0
+    for _ in range(20):
+        num_locs, num_signs = rng.randint(1, 8), rng.randint(1, 40)
+        loc_xyz = rng.uniform(-100.0, 100.0, (num_locs, 3))
+        sign_xyz = rng.uniform(-100.0, 100.0, (num_signs, 3))
+        # The kernel requires the signs to be sorted by x.
+        sign_xyz = sign_xyz[np.argsort(sign_xyz[:, 0])]
+        sign_yaws = rng.uniform(-360.0, 360.0, num_signs)
+        cam_yaw = rng.uniform(-180.0, 180.0)
+        best, matched = sim_utils._match_speed_signs_kernel(
+            loc_xyz, sign_xyz, cam_yaw, sign_yaws, dist_squared_threshold)
+        dist_squared = ((loc_xyz[:, np.newaxis, :] -
+                         sign_xyz[np.newaxis, :, :])**2).sum(axis=-1)
+        best_dist_squared = dist_squared[np.arange(num_locs), best]
+        assert np.allclose(best_dist_squared, dist_squared.min(axis=1)), \
+            "The kernel did not find the nearest sign."
+        yaw_diffs = (sign_yaws[best] - cam_yaw) % 360.0
+        expected = ((best_dist_squared < dist_squared_threshold)
+                    & (yaw_diffs > 30) & (yaw_diffs < 150))
+        assert (matched == expected).all(), \
+            "The match mask does not agree with the reference filters."
+
+
+## Stop marking projection tests
+
+
+def test_project_stop_corners():
+    """Test the batched corner projection against a per-corner reference."""
+    rng = np.random.RandomState(11)
+    width, height = 800.0, 600.0
+    intrinsic = np.array([[400.0, 0.0, 400.0], [0.0, 400.0, 300.0],
+                          [0.0, 0.0, 1.0]])
+    # A camera slightly translated from the world origin.
+    camera_matrix = np.eye(4)
+    camera_matrix[:3, 3] = [1.0, -2.0, 3.0]
+    inv_camera = np.linalg.inv(camera_matrix)
+    num_stops = 12
+    transforms = np.tile(np.eye(4), (num_stops, 1, 1))
+    transforms[:, :3, 3] = rng.uniform(-40.0, 40.0, (num_stops, 3))
+    corners = np.concatenate([
+        rng.uniform(-2.0, 2.0, (num_stops, 4, 3)),
+        np.ones((num_stops, 4, 1))
+    ],
+                             axis=2)
+    xs, ys, zs, valid = sim_utils._project_stop_corners(
+        transforms, corners, inv_camera, intrinsic, width, height)
+    for k in range(num_stops):
+        expected_valid = True
+        for c in range(4):
+            world = transforms[k].dot(corners[k, c])
+            camera = inv_camera.dot(world)
+            image = intrinsic.dot(camera[:3])
+            z = image[2]
+            x = image[0] / z
+            y = image[1] / z
+            assert np.isclose(xs[k, c], x), "X coordinates differ."
+            assert np.isclose(ys[k, c], y), "Y coordinates differ."
+            assert np.isclose(zs[k, c], z), "Depths differ."
+            if not (z >= 0 and x >= 0 and y >= 0 and x < width and y < height):
+                expected_valid = False
+        assert valid[k] == expected_valid, \
+            "The in-frame validity flag does not match the reference."